@@ -8,6 +8,7 @@
 
 import atexit
 from itertools import combinations
+from operator import itemgetter
 import sys
 from threading import Thread
 from time import sleep, strftime
@@ -28,8 +29,9 @@ outcomes = dt.outcomes.items()
 def counts():
   """Prints the number of traversals and outcomes recorded in the decision
   tree."""
-  print(sum(n for _, (n, _) in outcomes), "traversals")
-  print(len(outcomes), "outcomes")
+  # Only the counts are needed, so skip unpacking the items.
+  print(sum(map(itemgetter(0), dt.outcomes.values())), "traversals")
+  print(len(dt.outcomes), "outcomes")
 
 
 def progress():
@@ -38,24 +40,25 @@ def progress():
     print("Complete (100%)")
     return
   while True:
-    try:
-      n_opt = dt.checkpoints[Checkpoint.N_OPT]
-      recruits = tuple(bit_indices(dt.checkpoints[Checkpoint.RECRUITS]))
-      choices = list(combinations(bit_indices(RECRUITABLE.value), n_opt))
-      loyalty = dt.checkpoints[Checkpoint.LOYALTY] & LOYALTY_MASK.value
+    n_opt = dt.get_checkpoint(Checkpoint.N_OPT)
+    recruits = dt.get_checkpoint(Checkpoint.RECRUITS)
+    loyalty = dt.get_checkpoint(Checkpoint.LOYALTY)
+    if None not in (n_opt, recruits, loyalty):
       break
-    except KeyError:
-      # All checkpoints are only set at a certain depth in the decision tree,
-      # so waiting a bit before retrying the above query is usually sufficient.
-      sleep(0.1)
+    # All checkpoints are only set at a certain depth in the decision tree,
+    # so waiting a bit before retrying the above query is usually sufficient.
+    sleep(0.1)
+  recruits = tuple(bit_indices(recruits))
+  choices = list(combinations(bit_indices(RECRUITABLE_BITS), n_opt))
+  loyalty &= LOYALTY_MASK_BITS
   # Loyalties are only iterated for recruited allies.
-  shift_to = ffs(OPTIONAL.value)
+  shift_to = ffs(OPTIONAL_BITS)
   ally_count = abs(n_opt) + shift_to
   opt_loyalty = 0
   for r in recruits:
     opt_loyalty |= (loyalty >> (r - shift_to)) & (1 << shift_to)
     shift_to += 1
-  loyalty &= REQUIRED.value
+  loyalty &= REQUIRED_BITS
   loyalty |= opt_loyalty
   index = choices.index(recruits)
   print(f"{n_opt - 2}/5 -> ", end="")
@@ -5,11 +5,15 @@
 #
 
 from __future__ import annotations
-from collections.abc import Generator
+from collections.abc import Iterator
 import enum
+from functools import cache
 
 from . import bits
 
+# Enumeration members for each Ally value that has been iterated over
+_MEMBERS: dict[int, tuple[Ally, ...]] = {}
+
 class Ally(enum.Flag):
   """Enumeration of all allies in Mass Effect 2."""
 
@@ -35,31 +39,51 @@ class Ally(enum.Flag):
   def conj(self, conjunction: str = "and") -> str:
     """Converts this Ally into a human-readable string with the specified
     conjunction, if applicable."""
-    if self.name:
-      return self.name
-    if self.value == 0:
-      return "nobody"
-    if self.value == bits.mask(len(Ally)):
-      return "everyone"
-    # The condition in the generator expression is necessary to pass lint.
-    names = sorted(ally.name for ally in self if ally.name)
-    if len(names) == 2:
-      return f" {conjunction} ".join(names)
-    return f"{', '.join(names[:-1])}, {conjunction} {names[-1]}"
+    return _conj(self.value, conjunction)
 
   def __len__(self) -> int:
     """Counts the number of allies represented by this Ally."""
     return bits.popcount(self.value)
 
-  def __iter__(self) -> Generator[Ally, None, None]:
-    """Generates Ally enumeration members from this Ally."""
-    return (Ally(bit) for bit in bits.bits(self.value))
+  def __iter__(self) -> Iterator[Ally]:
+    """Iterates over Ally enumeration members from this Ally.
+    
+    The members are cached by value, so repeated iteration does not construct
+    new Ally objects.
+    """
+    if (members := _MEMBERS.get(self.value)) is None:
+      members = tuple(Ally(bit) for bit in bits.bits(self.value))
+      _MEMBERS[self.value] = members
+    return iter(members)
 
   def __str__(self) -> str:
     """Converts this Ally into a human-readable string."""
     return self.conj()
 
 
+# Names of the Ally enumeration members indexed by bit position
+# The condition in the generator expression is necessary to pass lint.
+_NAMES_BY_BIT = tuple(ally.name for ally in Ally if ally.name)
+
+@cache
+def _conj(value: int, conjunction: str) -> str:
+  """Converts an Ally value into a human-readable string with the specified
+  conjunction, if applicable.
+  
+  The result is cached, since the same values are described repeatedly.
+  """
+  if value == 0:
+    return "nobody"
+  if value == bits.mask(len(_NAMES_BY_BIT)):
+    return "everyone"
+  names = sorted(_NAMES_BY_BIT[index] for index in bits.bit_indices(value))
+  if len(names) == 1:
+    return names[0]
+  if len(names) == 2:
+    return f" {conjunction} ".join(names)
+  return f"{', '.join(names[:-1])}, {conjunction} {names[-1]}"
+
+
 #
 # Groups and Aliases
 #
@@ -114,4 +138,25 @@ ESCORTS = EVERYONE & ~Ally.Miranda
 
 # If Miranda is selected to lead the second fireteam, she will not die even if
 # she is not loyal.
-IMMORTAL_LEADERS = Ally.Miranda
\ No newline at end of file
+IMMORTAL_LEADERS = Ally.Miranda
+
+#
+# Integer Values
+#
+# Bitwise operations on Ally objects construct new Ally objects, which is much
+# slower than the same operations on ints. Prefer these in hot paths.
+#
+
+NOBODY_BITS = NOBODY.value
+EVERYONE_BITS = EVERYONE.value
+REQUIRED_BITS = REQUIRED.value
+OPTIONAL_BITS = OPTIONAL.value
+RECRUITABLE_BITS = RECRUITABLE.value
+LOYALTY_MASK_BITS = LOYALTY_MASK.value
+IDEAL_LEADERS_BITS = IDEAL_LEADERS.value
+IDEAL_TECHS_BITS = IDEAL_TECHS.value
+IDEAL_BIOTICS_BITS = IDEAL_BIOTICS.value
+TECHS_BITS = TECHS.value
+BIOTICS_BITS = BIOTICS.value
+ESCORTS_BITS = ESCORTS.value
+IMMORTAL_LEADERS_BITS = IMMORTAL_LEADERS.value
\ No newline at end of file
@@ -6,6 +6,7 @@
 
 from __future__ import annotations
 from collections.abc import Generator
+from functools import cache
 from typing import Literal
 
 IntGenerator = Generator[int, None, None]
@@ -18,11 +19,23 @@ def bits(x: int) -> IntGenerator:
   >>> [hex(bit) for bit in bits(0xbad)]
   ['0x1', '0x4', '0x8', '0x20', '0x80', '0x100', '0x200', '0x800']
   """
-  mask = 1
-  while mask <= x:
-    if mask & x:
-      yield mask
-    mask <<= 1
+  # Isolate and clear the lowest set bit each iteration to skip unset bits.
+  while x > 0:
+    bit = x & -x
+    yield bit
+    x ^= bit
+
+@cache
+def bit_tuple(x: int) -> tuple[int, ...]:
+  """Returns a tuple of the ints generated by bits(x).
+  
+  The result is cached, so this is much faster than bits() for values that are
+  decomposed repeatedly. Only use this for a small range of values.
+  
+  >>> bit_tuple(42)
+  (2, 8, 32)
+  """
+  return tuple(bits(x))
 
 def bit_indices(x: int, start: Literal[0, 1] = 0) -> IntGenerator:
   """Generates the bit index for each set bit in x where the index of the LSB
@@ -33,13 +46,55 @@ def bit_indices(x: int, start: Literal[0, 1] = 0) -> IntGenerator:
   >>> list(bit_indices(0x69, 1))
   [1, 4, 6, 7]
   """
-  index = start
-  mask = 1
-  while mask <= x:
-    if mask & x:
-      yield index
-    index += 1
-    mask <<= 1
+  start -= 1
+  while x > 0:
+    bit = x & -x
+    yield bit.bit_length() + start
+    x ^= bit
+
+def combinations(x: int, k: int, start: int = 0) -> IntGenerator:
+  """Generates an int for each combination of k set bits in x in the same order
+  as itertools.combinations(bits(x), k).
+  
+  If start is a non-zero combination of k bits, generation begins at the
+  combination equal to start, or the first one that follows it, without
+  generating the preceding ones.
+  
+  >>> list(combinations(0b1011, 2))
+  [3, 9, 10]
+  >>> list(combinations(0b1011, 2, 0b1001))
+  [9, 10]
+  >>> list(combinations(0b111, 0))
+  [0]
+  """
+  if k == 0:
+    yield 0
+    return
+  # Skip the bits preceding the first bit of start.
+  x &= ~mtz(start)
+  while popcount(x) >= k:
+    bit = x & -x
+    x ^= bit
+    if k == 1:
+      yield bit
+    else:
+      # Only the first combinations of the remaining bits may precede start.
+      rest_start = start ^ bit if bit == fsb(start) else 0
+      for rest in combinations(x, k - 1, rest_start):
+        yield bit | rest
+    start = 0
+
+@cache
+def combination_tuple(x: int, k: int) -> tuple[int, ...]:
+  """Returns a tuple of the ints generated by combinations(x, k).
+  
+  The result is cached, so this is much faster than combinations() for values
+  that are decomposed repeatedly. Only use this for a small range of values.
+  
+  >>> combination_tuple(0b1011, 2)
+  (3, 9, 10)
+  """
+  return tuple(combinations(x, k))
 
 def ffs(x: int) -> int:
   """Finds the position of the first set bit in x or -1 if no bits are set.
@@ -49,14 +104,7 @@ def ffs(x: int) -> int:
   >>> ffs(0xb00)
   8
   """
-  bit = 0
-  mask = 1
-  while mask <= x:
-    if mask & x:
-      return bit
-    bit += 1
-    mask <<= 1
-  return -1
+  return fsb(x).bit_length() - 1
 
 def fsb(x: int) -> int:
   """Returns the value of the first set bit in x or 0 if no bits are set.
@@ -66,12 +114,7 @@ def fsb(x: int) -> int:
   >>> fsb(0x88)
   8
   """
-  mask = 1
-  while mask <= x:
-    if mask & x:
-      return mask
-    mask <<= 1
-  return 0
+  return x & -x if x > 0 else 0
 
 def mask(length: int) -> int:
   """Returns a bit mask with length LSBs set.
@@ -97,4 +140,23 @@ def popcount(x: int) -> int:
   >>> popcount(0b1101111010101101)
   11
   """
-  return bin(x).count('1')
\ No newline at end of file
+  return x.bit_count()
+
+def subsets(x: int, start: int = 0) -> IntGenerator:
+  """Generates an int for each subset of the set bits in x in ascending order.
+  
+  If start is a subset of x, generation begins at start without generating the
+  preceding subsets.
+  
+  >>> list(subsets(0b1010))
+  [0, 2, 8, 10]
+  >>> list(subsets(0b1010, 0b1000))
+  [8, 10]
+  """
+  subset = start & x
+  while True:
+    yield subset
+    if subset == x:
+      return
+    # Advance to the next subset by carrying through the bits outside x.
+    subset = (subset - x) & x
\ No newline at end of file
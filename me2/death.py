@@ -4,10 +4,9 @@
 # Distributed under the MIT License.
 #
 
-import statistics
-from collections.abc import Callable
-from functools import partial, reduce
-from itertools import chain
+from collections.abc import Callable, Iterator
+from functools import lru_cache, partial, reduce
+from itertools import chain, islice
 from operator import or_ as op_or, and_ as op_and
 from typing import TypeVar
 
@@ -65,13 +64,24 @@ class UnexpectedlyVictimlessError(Exception):
 
 def get_victim(team: int, priority: list[int]) -> int:
   """Selects the teammate who should die based on the given priority."""
-  if (victim := next(filter(partial(op_and, team), priority), 0)):
-    return victim
+  # A plain loop is faster than filter() for such short lists.
+  for victim in priority:
+    if victim & team:
+      return victim
   # It should be impossible to encounter a situation where none of the teammates
   # are in the priority list.
   raise UnexpectedlyVictimlessError(
     f"No victim ({hex(team)} & {hex(reduce(op_or, priority, 0))} == 0)")
 
+def iter_victims(team: int, priority: list[int], limit: int) -> Iterator[int]:
+  """Selects up to limit teammates who should die, in order, based on the given
+  priority.
+  
+  This is equivalent to calling get_victim() repeatedly while removing each
+  victim from the team, but the priority list is only scanned once.
+  """
+  return islice(filter(partial(op_and, team), priority), limit)
+
 
 # Loyal allies who are left behind to defend during the final battle are
 # assigned defense scores according to their "innate defensiveness". If an ally
@@ -117,19 +127,55 @@ _DEFENSE_TOLL_FORMULAE: list[Callable[[float], int]] = [
 ]
 _DTF_LAST_INDEX = len(_DEFENSE_TOLL_FORMULAE) - 1
 
+# The formulae above are specialized for each team size by evaluating them for
+# every possible total defense score up front. Index this table by team size
+# and then by total score.
+_MAX_DEFENSE_SCORE = max(_DEFENSE_SCORE.values())
+_DEFENSE_TOLLS: list[tuple[int, ...]] = [()] + [
+  tuple(_DEFENSE_TOLL_FORMULAE[min(size, _DTF_LAST_INDEX)](total / size)
+        for total in range(_MAX_DEFENSE_SCORE * size + 1))
+  for size in range(1, len(Ally) + 1)
+]
+
+# Loyal allies in this group have the maximum defense score. If they are the
+# only defenders, nobody dies.
+_HIGH_SCORE = (Ally.Garrus | Ally.Grunt | Ally.Zaeed).value
+
+# Disloyal allies in this group have the minimum defense score (zero). If they
+# are the only defenders, the death toll is the worst possible for the team
+# size.
+_LOW_SCORE = (Ally.Jack | Ally.Kasumi | Ally.Mordin | Ally.Tali).value
+
 def _get_defense_toll(team: int, loyal: int) -> int:
   """Computes the death toll for the defense team."""
   if not (team_size := bits.popcount(team)):
     raise ValueError("Zero defending allies")
-  # Compute the average defense score. Disloyal allies' scores are reduced.
-  score_for = lambda ally: _DEFENSE_SCORE[ally] - bool(ally & ~loyal)
-  score = statistics.fmean(score_for(ally) for ally in bits.bits(team))
-  formula_index = min(team_size, _DTF_LAST_INDEX)
-  return _DEFENSE_TOLL_FORMULAE[formula_index](score)
+  tolls = _DEFENSE_TOLLS[team_size]
+  # Skip computing the total defense score for the best and worst cases.
+  if not team & ~(loyal & _HIGH_SCORE):
+    return 0
+  if not team & ~(_LOW_SCORE & ~loyal):
+    return tolls[0]
+  # Compute the total defense score. Disloyal allies' scores are reduced by 1.
+  score = sum(_DEFENSE_SCORE[ally] for ally in bits.bits(team))
+  return tolls[score - bits.popcount(team & ~loyal)]
 
 def get_defense_victims(team: int, loyal: int) -> int:
   """Selects the defending teammates who should die."""
-  toll = _get_defense_toll(team, loyal)
+  # Only the loyalty of the defending teammates matters, so normalize it to
+  # share cached results across squad selections.
+  return _get_defense_victims(team, team & loyal)
+
+@lru_cache(maxsize=1 << 16)
+def _get_defense_victims(team: int, loyal: int) -> int:
+  """Selects the defending teammates who should die.
+  
+  The result is cached, since the same defense teams are resolved repeatedly
+  for different squad selections. Bounded: all repeats occur within one
+  (recruits, loyalty) state.
+  """
+  if not (toll := _get_defense_toll(team, loyal)):
+    return 0
   # Disloyal teammates are chosen as victims before loyal ones.
   disloyal_filter = filter(partial(op_and, team & ~loyal), _DP_DEFENSE)
   loyal_filter = filter(partial(op_and, team & loyal), _DP_DEFENSE)
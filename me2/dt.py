@@ -6,21 +6,28 @@
 
 from __future__ import annotations
 import enum
-from functools import reduce
-from itertools import combinations
+from functools import lru_cache, reduce
+import gzip
 from operator import or_ as op_or
+import os
 import pickle
 from typing import Any, Optional
 
 from .ally import *
 from . import bits, death, encdec, util
 
-def describe_outcome(encoded: int, *, brief: bool = False) -> str:
-  """Produces a human-readable string describing the encoded outcome.
+def describe_outcome(outcome: int | encdec.DecodedOutcome, *,
+                     brief: bool = False) -> str:
+  """Produces a human-readable string describing the outcome.
   
-  For brief output, set brief to True.
+  The outcome may be encoded or already decoded (see encdec.decode_outcome()),
+  so callers that decode outcomes to query them do not need to decode them
+  again. For brief output, set brief to True.
   """
-  spared, loyalty, crew = encdec.decode_outcome(encoded)
+  if isinstance(outcome, encdec.DecodedOutcome):
+    spared, loyalty, crew = outcome
+  else:
+    spared, loyalty, crew = encdec.decode_outcome(outcome)
   ally_count = len(spared)
 
   if brief:
@@ -64,74 +71,76 @@ def describe_traversal(traversal: int) -> str:
     tlw_invert, tlw_unpicks = decoder.decode_choices()
   final_squad = decoder.decode_squad()
 
-  output = ""
+  # Collect the lines of the description and join them at the end.
+  lines: list[str] = []
   if upgraded_armor and upgraded_shield and upgraded_weapon:
-    output += "Upgrade everything.\n"
+    lines.append("Upgrade everything.")
   elif not (upgraded_armor or upgraded_shield or upgraded_weapon):
-    output += "No Normandy upgrades.\n"
+    lines.append("No Normandy upgrades.")
   else:
     upgrade_map = {
       "Silaris Armor": upgraded_armor,
       "Cyclonic Shields": upgraded_shield,
       "Thanix Cannon": upgraded_weapon
     }
-    output += f"Upgrade: {', '.join(k for k, v in upgrade_map.items() if v)}\n"
+    lines.append(
+      f"Upgrade: {', '.join(k for k, v in upgrade_map.items() if v)}")
 
-  output += f"Recruit: {recruits}\n"
+  lines.append(f"Recruit: {recruits}")
 
   if loyal == (recruits | REQUIRED) & LOYALTY_MASK:
-    output += "Do all loyalty missions.\n"
+    lines.append("Do all loyalty missions.")
   elif not loyal:
-    output += "Do no loyalty missions.\n"
+    lines.append("Do no loyalty missions.")
   else:
-    output += f"Loyalty Missions: {loyal}\n"
+    lines.append(f"Loyalty Missions: {loyal}")
   
   if not upgraded_shield:
-    output += "For the cargo bay squad, "
     cbs_take = reduce(op_or,
       cbs_picks[:-1] if cbs_invert else cbs_picks, NOBODY)
     cbs_leave = cbs_picks[-1] if cbs_invert else NOBODY
-    if cbs_take:
-      output += f"pick {cbs_take}"
-      if cbs_leave:
-        output += " and "
-    if cbs_leave:
-      output += f"make sure to leave {cbs_leave} behind"
-    output += ".\n"
+    lines.append(
+      f"For the cargo bay squad, {_describe_squad(cbs_take, cbs_leave)}.")
   
-  output += f"Choose {tech} as the tech specialist.\n"
+  lines.append(f"Choose {tech} as the tech specialist.")
   if has_leader1:
-    output += "Choose "
-    if not leader1:
-      output += "anyone except "
-    output += f"{ideal_leaders.conj('or')} to lead the second fireteam.\n"
+    anyone_except = "" if leader1 else "anyone except "
+    lines.append(f"Choose {anyone_except}{ideal_leaders.conj('or')} to lead "
+                 "the second fireteam.")
   else:
-    output += "The second fireteam leader does not matter.\n"
+    lines.append("The second fireteam leader does not matter.")
 
-  output += f"Choose {biotic} as the biotic specialist.\n"
-  output += f"Choose {leader2} to lead the diversion team.\n"
+  lines.append(f"Choose {biotic} as the biotic specialist.")
+  lines.append(f"Choose {leader2} to lead the diversion team.")
   if escort:
-    output += f"Send {escort} to escort the crew.\n"
+    lines.append(f"Send {escort} to escort the crew.")
   else:
-    output += "Do not send anyone to escort the crew.\n"
+    lines.append("Do not send anyone to escort the crew.")
   if has_tlw_unpicks:
-    output += "For the squad in the biotic shield, "
     tlw_take = tlw_unpicks[-1] if tlw_invert else NOBODY
     tlw_leave = reduce(op_or,
       tlw_unpicks[:-1] if tlw_invert else tlw_unpicks, NOBODY)
-    if tlw_take:
-      output += f"pick {tlw_take}"
-      if tlw_leave:
-        output += " and "
-    if tlw_leave:
-      output += f"make sure to leave {tlw_leave} behind"
-    output += ".\n"
-
-  output += f"Pick {final_squad} for your final squad.\n"
-  return output
-
-
-class Checkpoint(enum.Enum):
+    lines.append("For the squad in the biotic shield, "
+                 f"{_describe_squad(tlw_take, tlw_leave)}.")
+
+  lines.append(f"Pick {final_squad} for your final squad.")
+  lines.append("")
+  return "\n".join(lines)
+
+def _describe_squad(take: Ally, leave: Ally) -> str:
+  """Describes which allies to pick for a squad and which to leave behind."""
+  if take and leave:
+    return f"pick {take} and make sure to leave {leave} behind"
+  if take:
+    return f"pick {take}"
+  if leave:
+    return f"make sure to leave {leave} behind"
+  return ""
+
+
+# The checkpoint and cache keys are looked up several times for each traversal.
+# IntEnum members hash as ints, which is much faster than Enum.__hash__().
+class Checkpoint(enum.IntEnum):
   N_OPT = enum.auto()
   RECRUITS = enum.auto()
   LOYALTY = enum.auto()
@@ -150,20 +159,78 @@ class Checkpoint(enum.Enum):
   FINAL_SQUAD = enum.auto()
 
 
-class CacheKey(enum.Enum):
+class CacheKey(enum.IntEnum):
   CARGO_BAY_PICKS = enum.auto()
   IDEAL_LEADERS = enum.auto()
   LONG_WALK_UNPICKS = enum.auto()
 
+# Looking up enumeration members is relatively slow, so the decision methods
+# use these plain int equivalents instead.
+_CKPT_N_OPT = int(Checkpoint.N_OPT)
+_CKPT_RECRUITS = int(Checkpoint.RECRUITS)
+_CKPT_LOYALTY = int(Checkpoint.LOYALTY)
+_CKPT_MORINTH = int(Checkpoint.MORINTH)
+_CKPT_ARMOR = int(Checkpoint.ARMOR)
+_CKPT_SHIELD = int(Checkpoint.SHIELD)
+_CKPT_CB_PICK = int(Checkpoint.CB_PICK)
+_CKPT_WEAPON = int(Checkpoint.WEAPON)
+_CKPT_TECH = int(Checkpoint.TECH)
+_CKPT_LEADER1 = int(Checkpoint.LEADER1)
+_CKPT_BIOTIC = int(Checkpoint.BIOTIC)
+_CKPT_LEADER2 = int(Checkpoint.LEADER2)
+_CKPT_CREW = int(Checkpoint.CREW)
+_CKPT_ESCORT = int(Checkpoint.ESCORT)
+_CKPT_WALK_UNPICK = int(Checkpoint.WALK_UNPICK)
+_CKPT_FINAL_SQUAD = int(Checkpoint.FINAL_SQUAD)
+_CACHE_CARGO_BAY_PICKS = int(CacheKey.CARGO_BAY_PICKS)
+_CACHE_IDEAL_LEADERS = int(CacheKey.IDEAL_LEADERS)
+_CACHE_LONG_WALK_UNPICKS = int(CacheKey.LONG_WALK_UNPICKS)
+
 
 class DecisionTreePauseException(Exception):
   """Custom exception type for pausing execution of the decision tree."""
   pass
 
 
+# Integer values of individual allies referenced by the decision methods
+_SAMARA_BITS = Ally.Samara.value
+_MORINTH_BITS = Ally.Morinth.value
+
 # Interval in seconds between periodic saves.
 _SAVE_INTERVAL = 5 * 60
 
+# Data files are gzip-compressed. Files written before compression was
+# introduced are recognized by the absence of this header.
+_GZIP_MAGIC = b"\x1f\x8b"
+
+def _get_final_victims(team: int, squad: int, loyal: int) -> int:
+  """Selects the teammates who die after the final squad is chosen."""
+  # The remaining active teammates form the defense team.
+  victims = death.get_defense_victims(team & ~squad, loyal)
+  # Any member of your squad that is not loyal will die.
+  return victims | squad & ~loyal
+
+@lru_cache(maxsize=1 << 16)
+def _group_final_squads(team: int,
+                        loyal: int) -> tuple[tuple[int, int, int], ...]:
+  """Groups all possible final squads by the teammates who survive.
+  
+  Each group is a 3-tuple of the survivors, the number of squads in the group,
+  and the first squad in the group, ordered by first squad. The result is
+  cached, since sibling subtrees (e.g., different escorts) reach the same teams
+  repeatedly. Bounded: all repeats occur within one (recruits, loyalty) state.
+  """
+  groups: dict[int, list[int]] = {}
+  for squad in bits.combination_tuple(team, 2):
+    # Any active teammates at this point have survived.
+    survivors = team & ~_get_final_victims(team, squad, loyal)
+    if (group := groups.get(survivors)) is None:
+      groups[survivors] = [1, squad]
+    else:
+      group[0] += 1
+  return tuple((survivors, count, squad)
+               for survivors, (count, squad) in groups.items())
+
 class DecisionTree:
   """Generates outcomes and traversals for Mass Effect 2's final mission.
   
@@ -183,69 +250,105 @@ class DecisionTree:
       raise ValueError("A decision tree file path must be provided")
     # Stores checkpoint data that is necessary for traversal encoding but not
     # ideal for restoring iteration state.
-    self.cache: dict[CacheKey, Any] = {}
+    self.cache: dict[int, Any] = {}
     self.file_path = file_path
     self.loyal = 0
-    self.checkpoints: dict[Checkpoint, Any] = {}
+    # Checkpoint values are indexed by Checkpoint. None indicates that a
+    # checkpoint is not set, since no checkpoint value is ever None.
+    self.checkpoints: list[Any] = [None] * (max(Checkpoint) + 1)
     self.needs_save = False
     # The first value in the tuple is the number of traversals that achieve the
     # outcome (key), and the second value is an encoded traversal that achieves
     # the outcome.
     self.outcomes: dict[int, tuple[int, int]] = {}
     self.pausing = False
+    # Outcomes recorded since the last save and the number of outcome entries
+    # in the file (see save())
+    self.unsaved_outcomes: dict[int, tuple[int, int]] = {}
+    self.saved_entries = 0
     self.load()
 
   #
   # Outcome Encoding
   #
 
-  def record_outcome(self, team: int):
+  def record_outcome(self, team: int, count: int = 1):
     """Encodes the outcome based on the final state of the team and adds it to
     the outcome dictionary with a 2-tuple containing the number of traversals
-    resulting in that outcome and an encoding of the last such traversal."""
+    resulting in that outcome and an encoding of the first such traversal.
+    
+    If count is greater than 1, that many traversals are recorded, and the
+    current traversal is the first of them.
+    """
+    self._handle_requests()
+    self._record_outcome(team, count)
+
+  def _handle_requests(self):
+    """Handles pause and periodic save requests.
+    
+    This is called before recording outcomes rather than at every checkpoint.
+    The outcomes have not been recorded yet, so resuming will record them again.
+    """
+    if self.pausing:
+      raise DecisionTreePauseException()
+    if self.needs_save:
+      self.save()
+      self.needs_save = False
+
+  def _record_outcome(self, team: int, count: int):
+    """Implements record_outcome() without handling requests."""
+    # This runs for every traversal, so the checkpoints are read directly
+    # rather than through get_checkpoint(). Unset checkpoints are None (see
+    # get_checkpoint()), and unset upgrades default to True.
+    checkpoints = self.checkpoints
+    loyal = self.loyal
+
     # Check if the escort survived.
-    escort = self.checkpoints.get(Checkpoint.ESCORT, 0)
-    team |= escort & self.loyal
-
-    # The encoded outcome is 26 bits long.
-    outcome = encdec.encode_outcome(
-      spared = team,
-      loyalty = team & self.loyal,
-      crew = self.checkpoints.get(Checkpoint.CREW, False)
-    )
+    escort = checkpoints[_CKPT_ESCORT] or 0
+    team |= escort & loyal
+
+    # The encoded outcome is 26 bits long. This is encoded for every recorded
+    # outcome, so the arguments (spared, loyalty, crew) are passed positionally.
+    outcome = encdec.encode_outcome(team, team & loyal,
+                                    checkpoints[_CKPT_CREW] or False)
+
+    # Most outcomes are achieved by many traversals, but only one of them is
+    # kept. If the outcome has been recorded before, keep its first traversal
+    # and skip encoding this one.
+    if (entry := self.outcomes.get(outcome)) is not None:
+      self.outcomes[outcome] = self.unsaved_outcomes[outcome] = \
+        (entry[0] + count, entry[1])
+      return
 
     # The bit-width of the encoded traversal is variable. (min, max) = (48, 70)
-    encoder = encdec.Encoder()
-    encoder.encode_ally_optional(self.checkpoints[Checkpoint.RECRUITS])
-    encoder.encode_ally_loyalty(self.loyal)
-    encoder.encode_bool(self.checkpoints.get(Checkpoint.ARMOR, True))
-    shield = self.checkpoints.get(Checkpoint.SHIELD, True)
-    encoder.encode_bool(shield)
-    encoder.encode_bool(self.checkpoints.get(Checkpoint.WEAPON, True))
-    if not shield:
+    shield = checkpoints[_CKPT_SHIELD] is not False
+    leader1: Optional[bool] = checkpoints[_CKPT_LEADER1]
+    walk_unpick = checkpoints[_CKPT_WALK_UNPICK] is not None
+    traversal = encdec.encode_traversal(
+      recruits = checkpoints[_CKPT_RECRUITS],
+      loyalty = loyal,
+      armor = checkpoints[_CKPT_ARMOR] is not False,
+      shield = shield,
+      weapon = checkpoints[_CKPT_WEAPON] is not False,
       # This cache key is mandatory if the shield is not upgraded.
-      encoder.encode_choices(self.cache[CacheKey.CARGO_BAY_PICKS])
-    encoder.encode_ally_value_as_index(self.checkpoints[Checkpoint.TECH])
-    leader1: Optional[bool] = self.checkpoints.get(Checkpoint.LEADER1, None)
-    if leader1 is not None:
-      encoder.encode_bool(leader1)
+      cargo_bay_picks = (None if shield
+                         else self.cache[_CACHE_CARGO_BAY_PICKS]),
+      tech = checkpoints[_CKPT_TECH],
+      leader1 = leader1,
       # This cache key is mandatory if a non-ideal tech is selected.
-      encoder.encode_ideal_leaders(self.cache[CacheKey.IDEAL_LEADERS])
-    encoder.encode_ally_value_as_index(self.checkpoints[Checkpoint.BIOTIC])
-    encoder.encode_ally_value_as_index(self.checkpoints[Checkpoint.LEADER2])
-    encoder.encode_ally_value_as_index(escort)
-    walk_unpick = self.checkpoints.get(Checkpoint.WALK_UNPICK, None) is not None
-    encoder.encode_bool(walk_unpick)
-    if walk_unpick:
+      ideal_leaders = (None if leader1 is None
+                       else self.cache[_CACHE_IDEAL_LEADERS]),
+      biotic = checkpoints[_CKPT_BIOTIC],
+      leader2 = checkpoints[_CKPT_LEADER2],
+      escort = escort,
       # This cache key is mandatory if the biotic is not loyal and ideal and a
       # meaningful squad selection is possible.
-      encoder.encode_choices(self.cache[CacheKey.LONG_WALK_UNPICKS])
-    encoder.encode_squad(self.checkpoints.get(Checkpoint.FINAL_SQUAD, 0))
-    traversal = encoder.result
-    
-    # Replace the outcome tuple.
-    traversal_count = self.outcomes.get(outcome, (0, 0))[0] + 1
-    self.outcomes[outcome] = (traversal_count, traversal)
+      walk_unpicks = (self.cache[_CACHE_LONG_WALK_UNPICKS] if walk_unpick
+                      else None),
+      squad = checkpoints[_CKPT_FINAL_SQUAD] or 0
+    )
+    self.outcomes[outcome] = self.unsaved_outcomes[outcome] = \
+      (count, traversal)
   
   #
   # Persistence
@@ -254,32 +357,88 @@ class DecisionTree:
   def request_save(self):
     self.needs_save = True
 
-  def set_checkpoint(self, key: Checkpoint, value: Any):
-    """Sets the value for the requested checkpoint and checks if the user
-    requested a pause or if a periodic save was requested."""
+  def get_checkpoint(self, key: int, default: Any = None) -> Any:
+    """Gets the value for the requested checkpoint or default if it is not
+    set."""
+    value = self.checkpoints[key]
+    return default if value is None else value
+
+  def set_checkpoint(self, key: int, value: Any):
+    """Sets the value for the requested checkpoint."""
     self.checkpoints[key] = value
-    if self.pausing:
-      raise DecisionTreePauseException()
-    if self.needs_save:
-      self.save()
-      self.needs_save = False
+
+  def clear_checkpoint(self, key: int):
+    """Unsets the requested checkpoint."""
+    self.checkpoints[key] = None
 
   def save(self):
-    """Writes checkpoints and outcome data to a file."""
-    with open(self.file_path, "wb") as datafile:
-      pickler = pickle.Pickler(datafile)
-      pickler.dump(self.checkpoints)
-      pickler.dump(self.outcomes)
+    """Writes checkpoints and outcome data to a file.
+    
+    The file is a log of checkpoints and outcomes pairs. Usually, only the
+    outcomes recorded since the last save are appended. Once the log holds
+    twice as many outcome entries as there are outcomes, it is rewritten with
+    all outcomes in a single pair. Rewriting is done in a temporary file that
+    then replaces the original, so an interrupted save cannot lose data.
+    
+    Each save is written as a separate gzip member, so appending does not
+    require recompressing the existing data.
+    """
+    entries = self.saved_entries + len(self.unsaved_outcomes)
+    if self.saved_entries and entries <= 2 * len(self.outcomes):
+      self._dump(self.file_path, "ab", self.unsaved_outcomes)
+    else:
+      entries = len(self.outcomes)
+      temp_path = f"{self.file_path}.tmp"
+      self._dump(temp_path, "wb", self.outcomes)
+      os.replace(temp_path, self.file_path)
+    self.saved_entries = entries
+    self.unsaved_outcomes = {}
+
+  def _dump(self, path: str, mode: str, outcomes: dict[int, tuple[int, int]]):
+    """Writes checkpoints and the given outcomes to the file at path."""
+    # The fastest compression level is used to keep saves short. The encoded
+    # outcomes compress well regardless.
+    with gzip.open(path, mode, compresslevel=1) as datafile:
+      pickler = pickle.Pickler(datafile, pickle.HIGHEST_PROTOCOL)
+      # Checkpoints are stored as a dictionary of the set checkpoints.
+      pickler.dump({key: self.checkpoints[key] for key in Checkpoint
+                    if self.checkpoints[key] is not None})
+      pickler.dump(outcomes)
 
   def load(self):
     """Reads checkpoints and outcome data from a file."""
     try:
       with open(self.file_path, "rb") as datafile:
-        unpickler = pickle.Unpickler(datafile)
-        self.checkpoints = unpickler.load()
-        self.outcomes = unpickler.load()
+        compressed = datafile.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
     except FileNotFoundError:
-      pass
+      return
+    opener = gzip.open if compressed else open
+    with opener(self.file_path, "rb") as datafile:
+      unpickler = pickle.Unpickler(datafile)
+      self.outcomes = {}
+      # Replay the log. The last checkpoints and outcome entries win.
+      while True:
+        try:
+          if not datafile.peek(1):
+            break
+          checkpoints = unpickler.load()
+          outcomes = unpickler.load()
+        except (EOFError, pickle.UnpicklingError, gzip.BadGzipFile):
+          # Discard a pair truncated by an interrupted save, and make sure the
+          # next save rewrites the file instead of appending to it.
+          self.saved_entries = 0
+          break
+        self.checkpoints[:] = [None] * len(self.checkpoints)
+        for key, value in checkpoints.items():
+          self.checkpoints[key] = value
+        if self.outcomes:
+          self.outcomes.update(outcomes)
+        else:
+          self.outcomes = outcomes
+        self.saved_entries += len(outcomes)
+    # Uncompressed files are rewritten with compression on the next save.
+    if not compressed:
+      self.saved_entries = 0
   
   #
   # Runtime
@@ -294,7 +453,7 @@ class DecisionTree:
 
   def is_complete(self) -> bool:
     """Checks if the decision tree has exhausted all possible traversals."""
-    return self.checkpoints.get(Checkpoint.N_OPT, None) == 0
+    return self.get_checkpoint(Checkpoint.N_OPT) == 0
 
   def generate(self):
     """Generates decision tree outcomes.
@@ -324,178 +483,168 @@ class DecisionTree:
 
   def _choose_recruitment(self):
     # At least three optional allies must be recruited to finish the game.
-    n_start = self.checkpoints.get(Checkpoint.N_OPT, 3)
+    n_start = self.get_checkpoint(_CKPT_N_OPT, 3)
     if n_start == 0:
       return
     for n in range(n_start, len(RECRUITABLE) + 1):
-      self.set_checkpoint(Checkpoint.N_OPT, n)
+      self.set_checkpoint(_CKPT_N_OPT, n)
       self._choose_recruits(n)
     # Signal that all outcomes have been generated.
-    self.set_checkpoint(Checkpoint.N_OPT, 0)
+    self.set_checkpoint(_CKPT_N_OPT, 0)
 
   def _choose_recruits(self, n: int):
     # Iterate through all possible combinations of optional recruitment.
-    ckpt_recruits = self.checkpoints.get(Checkpoint.RECRUITS, NOBODY.value)
-    remaining_recruits = RECRUITABLE.value & ~bits.mtz(ckpt_recruits)
-    for recruits_tuple in combinations(bits.bits(remaining_recruits), n):
-      recruits: int = reduce(op_or, recruits_tuple)
-      if ckpt_recruits and recruits != ckpt_recruits:
-        continue
-      ckpt_recruits = NOBODY.value
-      self.set_checkpoint(Checkpoint.RECRUITS, recruits)
-      self._choose_loyalty_missions(recruits | REQUIRED.value)
-    del self.checkpoints[Checkpoint.RECRUITS]
+    ckpt_recruits = self.get_checkpoint(_CKPT_RECRUITS, NOBODY_BITS)
+    for recruits in bits.combinations(RECRUITABLE_BITS, n, ckpt_recruits):
+      self.set_checkpoint(_CKPT_RECRUITS, recruits)
+      self._choose_loyalty_missions(recruits | REQUIRED_BITS)
+    self.clear_checkpoint(_CKPT_RECRUITS)
 
   def _choose_loyalty_missions(self, team: int):
     # Iterate through all relevant loyalty mappings. Morinth is always loyal.
-    loyalty = self.checkpoints.get(Checkpoint.LOYALTY, Ally.Morinth.value)
-    while loyalty <= EVERYONE.value:
-      self.loyal = loyalty
-      # The loyalty of unrecruited allies does not matter. Avoid redundant
-      # traversals by "skipping" their bits.
-      if self.loyal & LOYALTY_MASK.value & ~team:
-        loyalty += bits.fsb(loyalty)
-        continue
-      self.set_checkpoint(Checkpoint.LOYALTY, loyalty)
+    # The loyalty of unrecruited allies does not matter, so only the subsets of
+    # the team are visited, in ascending order.
+    ckpt_loyalty = self.get_checkpoint(_CKPT_LOYALTY, _MORINTH_BITS)
+    for loyalty in bits.subsets(team & LOYALTY_MASK_BITS, ckpt_loyalty):
+      self.loyal = loyalty | _MORINTH_BITS
+      self.set_checkpoint(_CKPT_LOYALTY, self.loyal)
       self._choose_morinth(team)
-      # Increment loop variable.
-      loyalty += 1
-    del self.checkpoints[Checkpoint.LOYALTY]
+    self.clear_checkpoint(_CKPT_LOYALTY)
   
   def _choose_morinth(self, team: int):
-    if not self.checkpoints.get(Checkpoint.MORINTH, False):
+    if not self.get_checkpoint(_CKPT_MORINTH, False):
       self._choose_armor_upgrade(team)
     # If Samara was recruited and loyal, re-run with Morinth instead.
     # Recruiting Morinth always kills Samara.
-    if Ally.Samara.value & team & self.loyal:
-      self.set_checkpoint(Checkpoint.MORINTH, True)
-      self._choose_armor_upgrade(team | Ally.Morinth.value & ~Ally.Samara.value)
-    self.checkpoints.pop(Checkpoint.MORINTH, None)
+    if _SAMARA_BITS & team & self.loyal:
+      self.set_checkpoint(_CKPT_MORINTH, True)
+      self._choose_armor_upgrade(team | _MORINTH_BITS & ~_SAMARA_BITS)
+    self.clear_checkpoint(_CKPT_MORINTH)
 
   def _choose_armor_upgrade(self, team: int):
     # If you upgrade to Silaris Armor, no one dies.
-    if self.checkpoints.get(Checkpoint.ARMOR, True):
+    if self.get_checkpoint(_CKPT_ARMOR, True):
       self._choose_shield_upgrade(team)
     # Otherwise, there is a victim.
-    self.set_checkpoint(Checkpoint.ARMOR, False)
+    self.set_checkpoint(_CKPT_ARMOR, False)
     victim = death.get_victim(team, death.DP_NO_ARMOR_UPGRADE)
     self._choose_shield_upgrade(team & ~victim)
-    del self.checkpoints[Checkpoint.ARMOR]
+    self.clear_checkpoint(_CKPT_ARMOR)
 
   def _choose_shield_upgrade(self, team: int):
     # If you upgrade to Cyclonic Shields, no one dies.
-    if self.checkpoints.get(Checkpoint.SHIELD, True):
+    if self.get_checkpoint(_CKPT_SHIELD, True):
       self._choose_weapon_upgrade(team)
     # Otherwise, there is a victim, but you can affect who it is through your
     # squad selection for the battle in the cargo bay.
-    self.set_checkpoint(Checkpoint.SHIELD, False)
+    self.set_checkpoint(_CKPT_SHIELD, False)
     self._choose_cargo_bay_squad(team)
-    del self.checkpoints[Checkpoint.SHIELD]
+    self.clear_checkpoint(_CKPT_SHIELD)
 
   def _choose_cargo_bay_squad(self, team: int):
-    ckpt_pick = self.checkpoints.get(Checkpoint.CB_PICK, NOBODY.value)
+    ckpt_pick = self.get_checkpoint(_CKPT_CB_PICK, NOBODY_BITS)
     # If you do *not* pick the #1 victim, they will die. If you pick the #1
     # victim but not the #2 victim, the #2 victim will die. If you pick both,
     # the #3 victim will die. Therefore, there are only three possible victims.
-    victim_pool = team
+    # Selecting the prioritized victim(s) for your squad removes them from the
+    # victim pool, so the victims are simply the first three teammates in the
+    # death priority list.
     picks: list[int] = []
-    for pick in range(3):
-      victim = death.get_victim(victim_pool, death.DP_NO_SHIELD_UPGRADE)
+    victims = death.iter_victims(team, death.DP_NO_SHIELD_UPGRADE, 3)
+    for pick, victim in enumerate(victims):
       picks.append(victim)
       if pick >= ckpt_pick:
-        self.set_checkpoint(Checkpoint.CB_PICK, pick)
-        self.cache[CacheKey.CARGO_BAY_PICKS] = picks
+        self.set_checkpoint(_CKPT_CB_PICK, pick)
+        self.cache[_CACHE_CARGO_BAY_PICKS] = picks
         self._choose_weapon_upgrade(team & ~victim)
-      # Selecting the prioritized victim(s) for your squad removes them from the
-      # victim pool.
-      victim_pool &= ~victim
-    del self.cache[CacheKey.CARGO_BAY_PICKS]
-    del self.checkpoints[Checkpoint.CB_PICK]
+    del self.cache[_CACHE_CARGO_BAY_PICKS]
+    self.clear_checkpoint(_CKPT_CB_PICK)
 
   def _choose_weapon_upgrade(self, team: int):
     # If you upgrade to the Thanix Cannon, no one dies.
-    if self.checkpoints.get(Checkpoint.WEAPON, True):
+    if self.get_checkpoint(_CKPT_WEAPON, True):
       self._choose_tech(team)
     # Otherwise, there is a victim.
-    self.set_checkpoint(Checkpoint.WEAPON, False)
+    self.set_checkpoint(_CKPT_WEAPON, False)
     victim = death.get_victim(team, death.DP_NO_WEAPON_UPGRADE)
     self._choose_tech(team & ~victim)
-    del self.checkpoints[Checkpoint.WEAPON]
+    self.clear_checkpoint(_CKPT_WEAPON)
   
   def _choose_tech(self, team: int):
     # Iterate through all selectable teammates for the tech specialist.
-    cur_tech = self.checkpoints.get(Checkpoint.TECH, NOBODY.value)
-    for tech in bits.bits(team & TECHS.value & ~bits.mtz(cur_tech)):
-      self.set_checkpoint(Checkpoint.TECH, tech)
+    cur_tech = self.get_checkpoint(_CKPT_TECH, NOBODY_BITS)
+    ideal_techs = self.loyal & IDEAL_TECHS_BITS
+    for tech in bits.bit_tuple(team & TECHS_BITS & ~bits.mtz(cur_tech)):
+      self.set_checkpoint(_CKPT_TECH, tech)
       # If the tech specialist is loyal and ideal, their survival depends on the
       # first fireteam leader.
-      if tech & self.loyal & IDEAL_TECHS.value:
+      if tech & ideal_techs:
         self._choose_first_leader(team, tech)
       else:
         # Otherwise, they will die. The first fireteam leader does not matter.
         self._choose_biotic(team & ~tech)
-    del self.checkpoints[Checkpoint.TECH]
+    self.clear_checkpoint(_CKPT_TECH)
 
   def _choose_first_leader(self, team: int, tech: int):
     # Check if we have any ideal leaders.
-    ideal_leaders = team & ~tech & self.loyal & IDEAL_LEADERS.value
-    self.cache[CacheKey.IDEAL_LEADERS] = ideal_leaders
-    if self.checkpoints.get(Checkpoint.LEADER1, bool(ideal_leaders)):
-      self.set_checkpoint(Checkpoint.LEADER1, True)
+    ideal_leaders = team & ~tech & self.loyal & IDEAL_LEADERS_BITS
+    self.cache[_CACHE_IDEAL_LEADERS] = ideal_leaders
+    if self.get_checkpoint(_CKPT_LEADER1, bool(ideal_leaders)):
+      self.set_checkpoint(_CKPT_LEADER1, True)
       # If the leader is loyal and ideal, the tech will be spared.
       self._choose_biotic(team)
     # Otherwise, the tech will die.
-    self.set_checkpoint(Checkpoint.LEADER1, False)
+    self.set_checkpoint(_CKPT_LEADER1, False)
     self._choose_biotic(team & ~tech)
-    del self.cache[CacheKey.IDEAL_LEADERS]
-    del self.checkpoints[Checkpoint.LEADER1]
+    del self.cache[_CACHE_IDEAL_LEADERS]
+    self.clear_checkpoint(_CKPT_LEADER1)
 
   def _choose_biotic(self, team: int):
     # Iterate through all selectable teammates for the biotic specialist.
-    cur_biotic = self.checkpoints.get(Checkpoint.BIOTIC, NOBODY.value)
-    for biotic in bits.bits(team & BIOTICS.value & ~bits.mtz(cur_biotic)):
-      self.set_checkpoint(Checkpoint.BIOTIC, biotic)
+    cur_biotic = self.get_checkpoint(_CKPT_BIOTIC, NOBODY_BITS)
+    for biotic in bits.bit_tuple(team & BIOTICS_BITS & ~bits.mtz(cur_biotic)):
+      self.set_checkpoint(_CKPT_BIOTIC, biotic)
       self._choose_second_leader(team, biotic)
-    del self.checkpoints[Checkpoint.BIOTIC]
+    self.clear_checkpoint(_CKPT_BIOTIC)
 
   def _choose_second_leader(self, team: int, biotic: int):
-    # Iterate through all selectable teammates for the second fireteam leader.
-    cur_leader = self.checkpoints.get(Checkpoint.LEADER2, NOBODY.value)
-    for leader in bits.bits(team & ~(biotic | bits.mtz(cur_leader))):
-      self.set_checkpoint(Checkpoint.LEADER2, leader)
-      self._choose_save_the_crew(team, biotic, leader)
-    del self.checkpoints[Checkpoint.LEADER2]
-  
-  def _choose_save_the_crew(self, team: int, biotic: int, leader: int):
     # Escorting the crew is optional, if you can spare them.
     # NOTE: If only four teammates (the minimum possible) remain at this point,
     # then an escort cannot be selected, since Shepard must have two squadmates
     # for The Long Walk.
-    if not self.checkpoints.get(Checkpoint.CREW, False):
-      self._choose_walk_squad(team, biotic, leader)
-    if bits.popcount(team) > 4:
-      # Escorting the crew will save them.
-      self.set_checkpoint(Checkpoint.CREW, True)
-      self._choose_escort(team, biotic, leader)
-    self.checkpoints.pop(Checkpoint.CREW, None)
+    can_escort = bits.popcount(team) > 4
+    # Iterate through all selectable teammates for the second fireteam leader.
+    # The decision to save the crew is made inline for each leader to avoid a
+    # method call on this hot path.
+    cur_leader = self.get_checkpoint(_CKPT_LEADER2, NOBODY_BITS)
+    for leader in bits.bit_tuple(team & ~(biotic | bits.mtz(cur_leader))):
+      self.set_checkpoint(_CKPT_LEADER2, leader)
+      if not self.get_checkpoint(_CKPT_CREW, False):
+        self._choose_walk_squad(team, biotic, leader)
+      if can_escort:
+        # Escorting the crew will save them.
+        self.set_checkpoint(_CKPT_CREW, True)
+        self._choose_escort(team, biotic, leader)
+      self.clear_checkpoint(_CKPT_CREW)
+    self.clear_checkpoint(_CKPT_LEADER2)
 
   def _choose_escort(self, team: int, biotic: int, leader: int):
     # If an escort is selected, they will be spared if they are loyal.
     # Otherwise, they will die.
-    cur_escort = self.checkpoints.get(Checkpoint.ESCORT, NOBODY.value)
-    remaining_escorts = team & ESCORTS.value
+    cur_escort = self.get_checkpoint(_CKPT_ESCORT, NOBODY_BITS)
+    remaining_escorts = team & ESCORTS_BITS
     remaining_escorts &= ~(biotic | leader | bits.mtz(cur_escort))
-    for escort in bits.bits(remaining_escorts):
-      self.set_checkpoint(Checkpoint.ESCORT, escort)
+    for escort in bits.bit_tuple(remaining_escorts):
+      self.set_checkpoint(_CKPT_ESCORT, escort)
       # The escort is removed from the team, but they survive if they are loyal.
       # That logic is handled in record_outcome().
       self._choose_walk_squad(team & ~escort, biotic, leader)
-    del self.checkpoints[Checkpoint.ESCORT]
+    self.clear_checkpoint(_CKPT_ESCORT)
   
   def _choose_walk_squad(self, team: int, biotic: int, leader: int):
     # If the biotic specialist is loyal and ideal, they will not get anyone on
     # your squad killed, so the squad choice does not matter.
-    if biotic & self.loyal & IDEAL_BIOTICS.value:
+    if biotic & self.loyal & IDEAL_BIOTICS_BITS:
       return self._choose_final_squad(team, leader)
     # If your team is too small to merit a meaningful squad selection, there is
     # only one possible outcome.
@@ -505,43 +654,45 @@ class DecisionTree:
       return self._choose_final_squad(team & ~victim, leader)
     # Otherwise, you may be able to affect who the victim is through your squad
     # selection.
-    ckpt_unpick = self.checkpoints.get(Checkpoint.WALK_UNPICK, NOBODY.value)
+    ckpt_unpick = self.get_checkpoint(_CKPT_WALK_UNPICK, NOBODY_BITS)
     unpicks: list[int] = []
-    self.cache[CacheKey.LONG_WALK_UNPICKS] = unpicks
-    for unpick in range(min(bits.popcount(victim_pool) - 1, 3)):
-      victim = death.get_victim(victim_pool, death.DP_THE_LONG_WALK)
+    self.cache[_CACHE_LONG_WALK_UNPICKS] = unpicks
+    # *Not* selecting the prioritized victim(s) removes them from the victim
+    # pool, so the victims are the first teammates in the death priority list.
+    victims = death.iter_victims(victim_pool, death.DP_THE_LONG_WALK,
+                                 min(bits.popcount(victim_pool) - 1, 3))
+    for unpick, victim in enumerate(victims):
       unpicks.append(victim)
       if unpick >= ckpt_unpick:
-        self.set_checkpoint(Checkpoint.WALK_UNPICK, unpick)
+        self.set_checkpoint(_CKPT_WALK_UNPICK, unpick)
         self._choose_final_squad(team & ~victim, leader)
-      # *Not* selecting the prioritized victim(s) removes them from the victim
-      # pool.
-      victim_pool &= ~victim
-    del self.cache[CacheKey.LONG_WALK_UNPICKS]
-    del self.checkpoints[Checkpoint.WALK_UNPICK]
+    del self.cache[_CACHE_LONG_WALK_UNPICKS]
+    self.clear_checkpoint(_CKPT_WALK_UNPICK)
 
   def _choose_final_squad(self, team: int, leader: int):
     # The leader of the second fireteam will not die under several conditions:
     # 1. They are loyal and ideal.
     # 2. They are special-cased (Miranda).
     # 3. There are fewer than four active teammates (including the leader).
-    alive = bool(leader & self.loyal & IDEAL_LEADERS.value)
-    alive = alive or bool(leader & IMMORTAL_LEADERS.value)
+    loyal = self.loyal
+    alive = bool(leader & loyal & IDEAL_LEADERS_BITS)
+    alive = alive or bool(leader & IMMORTAL_LEADERS_BITS)
     if not (alive or bits.popcount(team) < 4):
       team &= ~leader
-    # Iterate through all possible final squads.
-    ckpt_squad = self.checkpoints.get(Checkpoint.FINAL_SQUAD, NOBODY.value)
-    squads = combinations(bits.bits(team & ~bits.mtz(ckpt_squad)), 2)
-    for squad_tuple in squads:
-      squad: int = reduce(op_or, squad_tuple)
-      if ckpt_squad and squad != ckpt_squad:
-        continue
-      ckpt_squad = NOBODY.value
-      self.set_checkpoint(Checkpoint.FINAL_SQUAD, squad)
-      # The remaining active teammates form the defense team.
-      victims = death.get_defense_victims(team & ~squad, self.loyal)
-      # Any member of your squad that is not loyal will die.
-      victims |= squad & ~self.loyal
-      # Any active teammates at this point have survived.
-      self.record_outcome(team & ~victims)
-    del self.checkpoints[Checkpoint.FINAL_SQUAD]
\ No newline at end of file
+    ckpt_squad = self.get_checkpoint(_CKPT_FINAL_SQUAD, NOBODY_BITS)
+    if ckpt_squad:
+      # Resume iterating through the final squads one at a time.
+      for squad in bits.combinations(team, 2, ckpt_squad):
+        self.set_checkpoint(_CKPT_FINAL_SQUAD, squad)
+        self.record_outcome(team & ~_get_final_victims(team, squad, loyal))
+    else:
+      # Many final squads lead to the same survivors, so record each group of
+      # them at once. Requests are handled before recording anything, so the
+      # whole loop is either recorded or repeated on resume.
+      self._handle_requests()
+      checkpoints = self.checkpoints
+      for survivors, count, squad in _group_final_squads(team, team & loyal):
+        # The first squad of each group represents its traversals.
+        checkpoints[_CKPT_FINAL_SQUAD] = squad
+        self._record_outcome(survivors, count)
+    self.clear_checkpoint(_CKPT_FINAL_SQUAD)
\ No newline at end of file
@@ -4,7 +4,8 @@
 # Distributed under the MIT License.
 #
 
-from typing import NamedTuple
+from functools import cache
+from typing import NamedTuple, Optional
 
 from . import ally, bits
 from .ally import Ally
@@ -12,10 +13,38 @@ from .ally import Ally
 _ALLY_LEN = len(Ally)
 _ALLY_LOYALTY_LEN = len(ally.LOYALTY_MASK)
 _ALLY_OPTIONAL_LEN = len(ally.OPTIONAL)
-_ALLY_OPTIONAL_SHIFT = bits.ffs(ally.OPTIONAL.value)
+_ALLY_OPTIONAL_SHIFT = bits.ffs(ally.OPTIONAL_BITS)
 _ALLY_INDEX_LEN = _ALLY_LEN.bit_length()
 _ALLY_INDEX_MASK = bits.mask(_ALLY_INDEX_LEN)
 _IDEAL_LEADERS_LEN = len(ally.IDEAL_LEADERS)
+_CHOICES_LEN = 1 + 2 * _ALLY_INDEX_LEN
+_SQUAD_LEN = 2 * _ALLY_INDEX_LEN
+_OUTCOME_LOYALTY_SHIFT = _ALLY_LEN
+_OUTCOME_CREW_SHIFT = _ALLY_LEN + _ALLY_LOYALTY_LEN
+
+# Ally enumeration members indexed by their 1-based index (see
+# Decoder.decode_ally_index()). Looking these up is much faster than
+# constructing them.
+_ALLIES_BY_INDEX = (ally.NOBODY, *Ally)
+
+@cache
+def _to_ally(value: int) -> Ally:
+  """Converts an int into an Ally.
+  
+  The result is cached, since constructing Ally objects is relatively slow and
+  the same values are decoded repeatedly.
+  """
+  return Ally(value)
+
+def _ally_from_index(index: int) -> Ally:
+  """Converts a 1-based index into an Ally (see Decoder.decode_ally_index())."""
+  if index < len(_ALLIES_BY_INDEX):
+    return _ALLIES_BY_INDEX[index]
+  # Invalid indices raise a ValueError.
+  return Ally(1 << (index - 1))
+
+# Bit masks indexed by length for every field length decoded by Decoder
+_MASKS = tuple(bits.mask(length) for length in range(_ALLY_LEN + 1))
 
 class Encoder:
   """Facilitates bit-packing various encodings in a variable sequence."""
@@ -39,15 +68,15 @@ class Encoder:
     
     For Ally enumeration members, see encode_ally_value_as_index().
     """
-    self._append(value & ally.EVERYONE.value, _ALLY_LEN)
+    self._append(value & ally.EVERYONE_BITS, _ALLY_LEN)
 
   def encode_ally_loyalty(self, loyalty: int):
     """Encodes an integer masked by LOYALTY_MASK."""
-    self._append(loyalty & ally.LOYALTY_MASK.value, _ALLY_LOYALTY_LEN)
+    self._append(loyalty & ally.LOYALTY_MASK_BITS, _ALLY_LOYALTY_LEN)
 
   def encode_ally_optional(self, value: int):
     """Encodes an integer masked by OPTIONAL."""
-    self._append((value & ally.OPTIONAL.value) >> _ALLY_OPTIONAL_SHIFT,
+    self._append((value & ally.OPTIONAL_BITS) >> _ALLY_OPTIONAL_SHIFT,
                  _ALLY_OPTIONAL_LEN)
 
   def _encode_ally_index(self, index: int):
@@ -65,20 +94,22 @@ class Encoder:
   
   def encode_ideal_leaders(self, leaders: int):
     """Encodes available, loyal, ideal leaders as a three-bit quantity."""
-    self._append(leaders & ally.IDEAL_LEADERS.value, _IDEAL_LEADERS_LEN)
+    self._append(leaders & ally.IDEAL_LEADERS_BITS, _IDEAL_LEADERS_LEN)
 
   def encode_squad(self, squad: int):
     """Encodes two Ally indices based on the given squad.
     
     Raises a ValueError if squad does not contain exactly two set bits.
     """
-    i = 0
-    for i, index in enumerate(bits.bit_indices(squad, 1), 1):
-      if i > 2:
-        raise ValueError(f"Too many squadmates: {Ally(squad)}")
-      self._encode_ally_index(index)
-    if i != 2:
+    size = bits.popcount(squad)
+    if size > 2:
+      raise ValueError(f"Too many squadmates: {Ally(squad)}")
+    if size < 2:
       raise ValueError(f"Not a full squad: {Ally(squad)}")
+    # The 1-based indices of the two set bits are their bit lengths. Both
+    # indices are appended at once.
+    self._append(bits.fsb(squad).bit_length()
+                 | squad.bit_length() << _ALLY_INDEX_LEN, _SQUAD_LEN)
 
   def encode_choices(self, choices: list[int]):
     """Encodes two Ally indices with a preceding bit indicating whether the
@@ -89,19 +120,78 @@ class Encoder:
     """
     first_choice = choices[0] if choices and choices[0] else 0
     second_choice = choices[1] if first_choice and len(choices) > 1 else 0
-    self.encode_bool(len(choices) < 3)
-    self.encode_ally_value_as_index(first_choice)
-    self.encode_ally_value_as_index(second_choice)
+    # The bool and both indices are appended at once.
+    first_index = (bits.ffs(first_choice) + 1) & _ALLY_INDEX_MASK
+    second_index = (bits.ffs(second_choice) + 1) & _ALLY_INDEX_MASK
+    self._append((len(choices) < 3)
+                 | first_index << 1
+                 | second_index << 1 + _ALLY_INDEX_LEN, _CHOICES_LEN)
 
 
 def encode_outcome(spared: int, loyalty: int, crew: bool) -> int:
-  """Encodes outcome data as an int."""
-  encoder = Encoder()
-  encoder.encode_ally_value(spared)
+  """Encodes outcome data as an int.
+  
+  This is equivalent to encoding spared with Encoder.encode_ally_value(), the
+  loyalty of spared allies with Encoder.encode_ally_loyalty(), and crew with
+  Encoder.encode_bool().
+  """
   # The loyalty of dead allies does not affect the outcome.
-  encoder.encode_ally_loyalty(spared & loyalty)
-  encoder.encode_bool(crew)
-  return encoder.result
+  loyalty &= spared & ally.LOYALTY_MASK_BITS
+  return (spared & ally.EVERYONE_BITS
+          | loyalty << _OUTCOME_LOYALTY_SHIFT
+          | bool(crew) << _OUTCOME_CREW_SHIFT)
+
+
+def _encode_choices(choices: list[int]) -> int:
+  """Encodes choices like Encoder.encode_choices() for encode_traversal()."""
+  first_choice = choices[0] if choices and choices[0] else 0
+  second_choice = choices[1] if first_choice and len(choices) > 1 else 0
+  return ((len(choices) < 3)
+          | first_choice.bit_length() << 1
+          | second_choice.bit_length() << 1 + _ALLY_INDEX_LEN)
+
+def encode_traversal(recruits: int, loyalty: int, armor: bool, shield: bool,
+                     weapon: bool, cargo_bay_picks: Optional[list[int]],
+                     tech: int, leader1: Optional[bool],
+                     ideal_leaders: Optional[int], biotic: int, leader2: int,
+                     escort: int, walk_unpicks: Optional[list[int]],
+                     squad: int) -> int:
+  """Encodes a decision tree traversal as an int.
+  
+  This produces the same result as the equivalent sequence of Encoder calls
+  without constructing an Encoder. Each ally argument except recruits,
+  loyalty, and squad must have at most one bit set, and squad must have
+  exactly two bits set. cargo_bay_picks is only encoded if shield is False,
+  ideal_leaders is only encoded if leader1 is not None, and walk_unpicks is
+  only encoded if it is not None.
+  """
+  result = ((recruits & ally.OPTIONAL_BITS) >> _ALLY_OPTIONAL_SHIFT
+            | (loyalty & ally.LOYALTY_MASK_BITS) << _ALLY_OPTIONAL_LEN)
+  shift = _ALLY_OPTIONAL_LEN + _ALLY_LOYALTY_LEN
+  result |= (bool(armor) | bool(shield) << 1 | bool(weapon) << 2) << shift
+  shift += 3
+  if not shield:
+    result |= _encode_choices(cargo_bay_picks or []) << shift
+    shift += _CHOICES_LEN
+  # For allies with at most one bit set, the 1-based index of the first set
+  # bit is the bit length.
+  result |= tech.bit_length() << shift
+  shift += _ALLY_INDEX_LEN
+  if leader1 is not None:
+    result |= (bool(leader1)
+               | ((ideal_leaders or 0) & ally.IDEAL_LEADERS_BITS) << 1) << shift
+    shift += 1 + _IDEAL_LEADERS_LEN
+  result |= (biotic.bit_length()
+             | leader2.bit_length() << _ALLY_INDEX_LEN
+             | escort.bit_length() << 2 * _ALLY_INDEX_LEN) << shift
+  shift += 3 * _ALLY_INDEX_LEN
+  result |= (walk_unpicks is not None) << shift
+  shift += 1
+  if walk_unpicks is not None:
+    result |= _encode_choices(walk_unpicks) << shift
+    shift += _CHOICES_LEN
+  return result | ((squad & -squad).bit_length()
+                   | squad.bit_length() << _ALLY_INDEX_LEN) << shift
 
 
 class Decoder:
@@ -112,7 +202,7 @@ class Decoder:
   def _shift(self, length: int) -> int:
     """Returns the least significant length bits of the encoded value and
     right-shifts them out."""
-    encoded = self.encoded & bits.mask(length)
+    encoded = self.encoded & _MASKS[length]
     self.encoded >>= length
     return encoded
 
@@ -122,29 +212,37 @@ class Decoder:
 
   def decode_ally(self) -> Ally:
     """Decodes a compound Ally."""
-    return Ally(self._shift(_ALLY_LEN))
+    return _to_ally(self._shift(_ALLY_LEN))
   
   def decode_ally_loyalty(self) -> Ally:
     """Decodes a compound Ally masked by LOYALTY_MASK."""
-    return Ally(self._shift(_ALLY_LOYALTY_LEN))
+    return _to_ally(self._shift(_ALLY_LOYALTY_LEN))
 
   def decode_ally_optional(self) -> Ally:
     """Decodes a compound Ally masked by OPTIONAL."""
-    return Ally(self._shift(_ALLY_OPTIONAL_LEN) << _ALLY_OPTIONAL_SHIFT)
+    return _to_ally(self._shift(_ALLY_OPTIONAL_LEN) << _ALLY_OPTIONAL_SHIFT)
 
   def decode_ally_index(self) -> Ally:
     """Decodes an index as an Ally."""
-    index = self._shift(_ALLY_INDEX_LEN)
-    return Ally(1 << (index - 1)) if index > 0 else ally.NOBODY
+    return _ally_from_index(self._shift(_ALLY_INDEX_LEN))
 
   def decode_ideal_leaders(self) -> Ally:
     """Decodes a compound Ally masked by IDEAL_LEADERS."""
-    return Ally(self._shift(_IDEAL_LEADERS_LEN))
+    return _to_ally(self._shift(_IDEAL_LEADERS_LEN))
 
   def decode_squad(self) -> Ally:
-    """Decodes two indices as a compound Ally."""
-    squad = self.decode_ally_index()
-    return squad | self.decode_ally_index()
+    """Decodes two indices as a compound Ally.
+    
+    Raises a ValueError if the indices do not decode to exactly two allies.
+    """
+    # Both indices are shifted out at once.
+    indices = self._shift(_SQUAD_LEN)
+    first = _ally_from_index(indices & _ALLY_INDEX_MASK)
+    second = _ally_from_index(indices >> _ALLY_INDEX_LEN)
+    squad = first.value | second.value
+    if bits.popcount(squad) != 2:
+      raise ValueError(f"Not a full squad: {_to_ally(squad)}")
+    return _to_ally(squad)
 
   def decode_choices(self) -> tuple[bool, list[Ally]]:
     """Decodes two indices with a preceding bit indicating whether the last
@@ -153,13 +251,13 @@ class Decoder:
     The semantics of this value and the phrase "opposite choice" are
     context-dependent.
     """
-    invert_last = self.decode_bool()
-    choices = []
-    for _ in range(2):
-      choice = self.decode_ally_index()
-      if choice:
-        choices.append(choice)
-    return invert_last, choices
+    # The bool and both indices are shifted out at once. Zero indices are
+    # omitted from the choices.
+    field = self._shift(_CHOICES_LEN)
+    indices = field >> 1
+    choices = [_ally_from_index(indices & _ALLY_INDEX_MASK),
+               _ally_from_index(indices >> _ALLY_INDEX_LEN)]
+    return bool(field & 1), [choice for choice in choices if choice]
 
 
 class DecodedOutcome(NamedTuple):
@@ -169,9 +267,13 @@ class DecodedOutcome(NamedTuple):
 
 
 def decode_outcome(encoded: int) -> DecodedOutcome:
-  """Decodes outcome data from an int."""
-  decoder = Decoder(encoded)
-  spared = decoder.decode_ally()
-  loyalty = decoder.decode_ally_loyalty() | Ally.Morinth & spared
-  crew = decoder.decode_bool()
-  return DecodedOutcome(spared, loyalty, crew)
\ No newline at end of file
+  """Decodes outcome data from an int.
+  
+  This is the inverse of encode_outcome().
+  """
+  spared = encoded & ally.EVERYONE_BITS
+  loyalty = encoded >> _OUTCOME_LOYALTY_SHIFT & ally.LOYALTY_MASK_BITS
+  # Morinth's loyalty is not encoded, since she is always loyal.
+  loyalty |= spared & ~ally.LOYALTY_MASK_BITS
+  crew = bool(encoded >> _OUTCOME_CREW_SHIFT & 1)
+  return DecodedOutcome(_to_ally(spared), _to_ally(loyalty), crew)
\ No newline at end of file
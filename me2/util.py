@@ -8,7 +8,7 @@ from __future__ import annotations
 from collections.abc import Callable, Iterable, Mapping
 from contextlib import suppress
 import signal
-from threading import Timer
+from threading import Event, Thread
 from typing import Any, Optional
 
 class PeriodicTimer:
@@ -20,11 +20,14 @@ class PeriodicTimer:
                kwargs: Optional[Mapping[str, Any]] = None):
     """Creates a timer that periodically calls function with arguments args and
     keyword arguments kwargs every interval seconds."""
-    def periodic_function(*_args: Any, **_kwargs: Any):
-      function(*_args, **_kwargs)
-      self.timer = Timer(interval, periodic_function, _args, _kwargs)
-      self.timer.start()
-    self.timer = Timer(interval, periodic_function, args, kwargs)
+    _args = args if args is not None else ()
+    _kwargs = kwargs if kwargs is not None else {}
+    def periodic_function():
+      # A single thread waits out each interval until the timer is cancelled.
+      while not self.finished.wait(interval):
+        function(*_args, **_kwargs)
+    self.finished = Event()
+    self.thread = Thread(target=periodic_function, daemon=True)
 
   def __enter__(self) -> PeriodicTimer:
     self.start()
@@ -35,12 +38,12 @@ class PeriodicTimer:
 
   def cancel(self):
     """Cancels the periodic timer."""
-    self.timer.cancel()
+    self.finished.set()
 
   def start(self):
     """Starts the periodic timer."""
     # NOTE: This implementation is not restartable.
-    self.timer.start()
+    self.thread.start()
 
 
 class SigintHandler:
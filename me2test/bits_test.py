@@ -14,6 +14,13 @@ class BitsTest(unittest.TestCase):
   def test_no_bits(self):
     self.assertEqual(list(bits(0)), [])
 
+class BitTupleTest(unittest.TestCase):
+  def test_has_bits(self):
+    self.assertEqual(bit_tuple(42), (2, 8, 32))
+
+  def test_no_bits(self):
+    self.assertEqual(bit_tuple(0), ())
+
 class BitIndicesTest(unittest.TestCase):
   def test_has_bits(self):
     self.assertEqual(list(bit_indices(0x69)), [0, 3, 5, 6])
@@ -21,6 +28,41 @@ class BitIndicesTest(unittest.TestCase):
   def test_no_bits(self):
     self.assertEqual(list(bit_indices(0)), [])
 
+class CombinationsTest(unittest.TestCase):
+  def test_pairs(self):
+    self.assertEqual(list(combinations(0x69, 2)),
+                     [0x09, 0x21, 0x41, 0x28, 0x48, 0x60])
+
+  def test_all_bits(self):
+    self.assertEqual(list(combinations(0x69, 4)), [0x69])
+
+  def test_too_many_bits(self):
+    self.assertEqual(list(combinations(0x69, 5)), [])
+
+  def test_start(self):
+    self.assertEqual(list(combinations(0x69, 2, 0x28)), [0x28, 0x48, 0x60])
+
+  def test_start_not_a_combination(self):
+    self.assertEqual(list(combinations(0x69, 2, 0x11)), [0x21, 0x41, 0x28,
+                                                         0x48, 0x60])
+
+  def test_every_start(self):
+    # Starting at any combination resumes the full sequence at that point.
+    for x in (0x69, 0x1fff, 0x1a5c):
+      for k in range(1, popcount(x) + 1):
+        full = list(combinations(x, k))
+        for i, start in enumerate(full):
+          with self.subTest(x=x, k=k, start=start):
+            self.assertEqual(list(combinations(x, k, start)), full[i:])
+
+class CombinationTupleTest(unittest.TestCase):
+  def test_pairs(self):
+    self.assertEqual(combination_tuple(0x69, 2),
+                     (0x09, 0x21, 0x41, 0x28, 0x48, 0x60))
+
+  def test_too_many_bits(self):
+    self.assertEqual(combination_tuple(0x69, 5), ())
+
 class FfsTest(unittest.TestCase):
   def test_ffs_one_bit(self):
     self.assertEqual(ffs(0x2000), 13)
@@ -67,6 +109,22 @@ class PopcountTest(unittest.TestCase):
   def test_zero(self):
     self.assertEqual(popcount(0), 0)
 
+class SubsetsTest(unittest.TestCase):
+  def test_all_subsets(self):
+    # Every subset is generated exactly once, in ascending order.
+    for x in (0, 0x69, 0x1fff, 0x1a5c):
+      with self.subTest(x=x):
+        result = list(subsets(x))
+        self.assertEqual(len(result), 1 << popcount(x))
+        self.assertEqual(result, sorted(set(result)))
+        self.assertTrue(all(subset & ~x == 0 for subset in result))
+
+  def test_every_start(self):
+    full = list(subsets(0x1a5c))
+    for i, start in enumerate(full):
+      with self.subTest(start=start):
+        self.assertEqual(list(subsets(0x1a5c, start)), full[i:])
+
 
 if __name__ == "__main__":
   unittest.main()
\ No newline at end of file
@@ -0,0 +1,150 @@
+#
+# Copyright (c) 2022 Andrew Lehmer
+#
+# Distributed under the MIT License.
+#
+
+import os
+import pickle
+import tempfile
+import unittest
+
+from me2.ally import Ally
+from me2.dt import Checkpoint, DecisionTree
+
+# Teams that encode to distinct outcomes
+_TEAM_A = (Ally.Garrus | Ally.Jack | Ally.Jacob).value
+_TEAM_B = (Ally.Grunt | Ally.Miranda | Ally.Mordin).value
+_TEAM_C = (Ally.Kasumi | Ally.Tali | Ally.Zaeed).value
+
+class SaveTest(unittest.TestCase):
+  def setUp(self) -> None:
+    # Each test gets a fresh data file.
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.file_path = os.path.join(self.directory.name, "test.dat")
+    self.tree = self.new_tree()
+
+  def new_tree(self) -> DecisionTree:
+    """Loads the data file and sets the checkpoints required to record
+    outcomes."""
+    tree = DecisionTree(self.file_path)
+    tree.set_checkpoint(Checkpoint.RECRUITS, (Ally.Grunt | Ally.Kasumi |
+                                              Ally.Tali | Ally.Zaeed).value)
+    tree.set_checkpoint(Checkpoint.TECH, Ally.Tali.value)
+    tree.set_checkpoint(Checkpoint.BIOTIC, Ally.Jack.value)
+    tree.set_checkpoint(Checkpoint.LEADER2, Ally.Miranda.value)
+    tree.set_checkpoint(Checkpoint.FINAL_SQUAD, (Ally.Garrus |
+                                                 Ally.Grunt).value)
+    return tree
+
+  def test_append(self):
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.record_outcome(_TEAM_B)
+    self.tree.save()
+    self.assertEqual(self.tree.saved_entries, 2)
+    self.tree.record_outcome(_TEAM_C)
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    # Both changed outcomes were appended.
+    self.assertEqual(self.tree.saved_entries, 4)
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.outcomes, self.tree.outcomes)
+    self.assertEqual(reloaded.saved_entries, 4)
+
+  def test_checkpoints(self):
+    self.tree.set_checkpoint(Checkpoint.N_OPT, 5)
+    self.tree.set_checkpoint(Checkpoint.SHIELD, False)
+    self.tree.save()
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.checkpoints, self.tree.checkpoints)
+    # Cleared checkpoints stay cleared after appending.
+    self.tree.clear_checkpoint(Checkpoint.SHIELD)
+    self.tree.save()
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.checkpoints, self.tree.checkpoints)
+    self.assertIsNone(reloaded.get_checkpoint(Checkpoint.SHIELD))
+
+  def test_rewrite(self):
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    self.assertEqual(self.tree.saved_entries, 1)
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    self.assertEqual(self.tree.saved_entries, 2)
+    # The log would hold more than twice as many entries as outcomes, so it is
+    # rewritten with a single entry per outcome.
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    self.assertEqual(self.tree.saved_entries, 1)
+    self.assertFalse(os.path.exists(f"{self.file_path}.tmp"))
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.outcomes, self.tree.outcomes)
+    self.assertEqual(reloaded.saved_entries, 1)
+    self.assertEqual([n for n, _ in reloaded.outcomes.values()], [3])
+
+  def test_compressed(self):
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    with open(self.file_path, "rb") as datafile:
+      self.assertEqual(datafile.read(2), b"\x1f\x8b")
+
+  def test_legacy(self):
+    # Files written before compression hold a single uncompressed pair.
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.record_outcome(_TEAM_B)
+    checkpoints = {key: self.tree.checkpoints[key] for key in Checkpoint
+                   if self.tree.checkpoints[key] is not None}
+    with open(self.file_path, "wb") as datafile:
+      pickle.dump(checkpoints, datafile)
+      pickle.dump(self.tree.outcomes, datafile)
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.outcomes, self.tree.outcomes)
+    self.assertEqual(reloaded.checkpoints, self.tree.checkpoints)
+    # The next save rewrites the file with compression.
+    self.assertEqual(reloaded.saved_entries, 0)
+    reloaded.save()
+    with open(self.file_path, "rb") as datafile:
+      self.assertEqual(datafile.read(2), b"\x1f\x8b")
+    self.assertEqual(DecisionTree(self.file_path).outcomes,
+                     self.tree.outcomes)
+
+  def test_truncated(self):
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    outcomes = dict(self.tree.outcomes)
+    checkpoints = list(self.tree.checkpoints)
+    size = os.path.getsize(self.file_path)
+    self.tree.set_checkpoint(Checkpoint.N_OPT, 4)
+    self.tree.record_outcome(_TEAM_B)
+    self.tree.record_outcome(_TEAM_C)
+    self.tree.save()
+    # Cut the file in the middle of the appended entry.
+    with open(self.file_path, "r+b") as datafile:
+      datafile.truncate((size + os.path.getsize(self.file_path)) // 2)
+    reloaded = DecisionTree(self.file_path)
+    self.assertEqual(reloaded.outcomes, outcomes)
+    self.assertEqual(reloaded.checkpoints, checkpoints)
+    self.assertEqual(reloaded.saved_entries, 0)
+
+  def test_save_after_truncated(self):
+    self.tree.record_outcome(_TEAM_A)
+    self.tree.save()
+    size = os.path.getsize(self.file_path)
+    self.tree.record_outcome(_TEAM_B)
+    self.tree.save()
+    with open(self.file_path, "r+b") as datafile:
+      datafile.truncate(size + 1)
+    reloaded = DecisionTree(self.file_path)
+    reloaded.record_outcome(_TEAM_C)
+    reloaded.save()
+    # Appending after the truncated entry would lose the new outcomes, so the
+    # file is rewritten instead.
+    self.assertEqual(reloaded.saved_entries, 2)
+    rereloaded = DecisionTree(self.file_path)
+    self.assertEqual(rereloaded.outcomes, reloaded.outcomes)
+    self.assertEqual(rereloaded.saved_entries, 2)
+
+
+if __name__ == "__main__":
+  unittest.main()
\ No newline at end of file
@@ -6,7 +6,7 @@
 
 from me2.ally import Ally
 from me2.encdec import DecodedOutcome, Decoder, Encoder
-from me2.encdec import decode_outcome, encode_outcome
+from me2.encdec import decode_outcome, encode_outcome, encode_traversal
 import unittest
 
 class EncoderTest(unittest.TestCase):
@@ -44,6 +44,12 @@ class EncoderTest(unittest.TestCase):
     self.encoder.encode_squad((Ally.Morinth | Ally.Jack).value)
     self.assertEqual(self.encoder.result, 0xd4a1)
 
+  def test_encode_squad_invalid(self):
+    with self.assertRaises(ValueError):
+      self.encoder.encode_squad(Ally.Garrus.value)
+    with self.assertRaises(ValueError):
+      self.encoder.encode_squad((Ally.Garrus | Ally.Tali | Ally.Jack).value)
+
   def test_encode_choices(self):
     self.encoder.encode_choices([])
     self.encoder.encode_choices([Ally.Jacob.value])
@@ -65,6 +71,74 @@ class OutcomeEncoderTest(unittest.TestCase):
     self.assertEqual(encoded_outcome, 0x2044422)
 
 
+class TraversalEncoderTest(unittest.TestCase):
+  def test_all_optional_fields(self):
+    encoder = Encoder()
+    encoder.encode_ally_optional((Ally.Grunt | Ally.Tali | Ally.Zaeed).value)
+    encoder.encode_ally_loyalty((Ally.Garrus | Ally.Tali).value)
+    encoder.encode_bool(False)
+    encoder.encode_bool(False)
+    encoder.encode_bool(True)
+    encoder.encode_choices([Ally.Tali.value, Ally.Garrus.value])
+    encoder.encode_ally_value_as_index(Ally.Jacob.value)
+    encoder.encode_bool(True)
+    encoder.encode_ideal_leaders(Ally.Garrus.value)
+    encoder.encode_ally_value_as_index(Ally.Jack.value)
+    encoder.encode_ally_value_as_index(Ally.Garrus.value)
+    encoder.encode_ally_value_as_index(Ally.Mordin.value)
+    encoder.encode_bool(True)
+    encoder.encode_choices([Ally.Zaeed.value])
+    encoder.encode_squad((Ally.Grunt | Ally.Miranda).value)
+    encoded_traversal = encode_traversal(
+      recruits = (Ally.Grunt | Ally.Tali | Ally.Zaeed).value,
+      loyalty = (Ally.Garrus | Ally.Tali).value,
+      armor = False,
+      shield = False,
+      weapon = True,
+      cargo_bay_picks = [Ally.Tali.value, Ally.Garrus.value],
+      tech = Ally.Jacob.value,
+      leader1 = True,
+      ideal_leaders = Ally.Garrus.value,
+      biotic = Ally.Jack.value,
+      leader2 = Ally.Garrus.value,
+      escort = Ally.Mordin.value,
+      walk_unpicks = [Ally.Zaeed.value],
+      squad = (Ally.Grunt | Ally.Miranda).value
+    )
+    self.assertEqual(encoded_traversal, encoder.result)
+
+  def test_no_optional_fields(self):
+    encoder = Encoder()
+    encoder.encode_ally_optional((Ally.Kasumi | Ally.Legion).value)
+    encoder.encode_ally_loyalty(0)
+    encoder.encode_bool(True)
+    encoder.encode_bool(True)
+    encoder.encode_bool(True)
+    encoder.encode_ally_value_as_index(Ally.Legion.value)
+    encoder.encode_ally_value_as_index(Ally.Samara.value)
+    encoder.encode_ally_value_as_index(Ally.Jacob.value)
+    encoder.encode_ally_value_as_index(0)
+    encoder.encode_bool(False)
+    encoder.encode_squad((Ally.Garrus | Ally.Morinth).value)
+    encoded_traversal = encode_traversal(
+      recruits = (Ally.Kasumi | Ally.Legion).value,
+      loyalty = 0,
+      armor = True,
+      shield = True,
+      weapon = True,
+      cargo_bay_picks = None,
+      tech = Ally.Legion.value,
+      leader1 = None,
+      ideal_leaders = None,
+      biotic = Ally.Samara.value,
+      leader2 = Ally.Jacob.value,
+      escort = 0,
+      walk_unpicks = None,
+      squad = (Ally.Garrus | Ally.Morinth).value
+    )
+    self.assertEqual(encoded_traversal, encoder.result)
+
+
 class DecoderTest(unittest.TestCase):
   def test_decode_bool(self):
     decoder = Decoder(2)
@@ -96,6 +170,12 @@ class DecoderTest(unittest.TestCase):
     self.assertEqual(decoder.decode_squad(), Ally.Jack | Ally.Grunt)
     self.assertEqual(decoder.decode_squad(), Ally.Morinth | Ally.Miranda)
 
+  def test_decode_squad_invalid(self):
+    with self.assertRaises(ValueError):
+      Decoder(0x11).decode_squad()
+    with self.assertRaises(ValueError):
+      Decoder(0x01).decode_squad()
+
   def test_decode_choices(self):
     decoder = Decoder(0x3640f)
     self.assertEqual(decoder.decode_choices(), (True, [Ally.Kasumi]))